@@ -2,71 +2,356 @@ import sys
 import subprocess
 import os
 import platform
-import threading
+import signal
+import shlex
+import shutil
 import re
+import select
+import time
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                            QWidget, QPushButton, QTextEdit, QLineEdit, QComboBox, 
                            QCheckBox, QLabel, QFrame, QSplitter, QGroupBox, QGridLayout)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt6.QtGui import QFont, QPalette, QColor, QIcon
+from PyQt6.QtCore import Qt, QProcess, pyqtSignal, QTimer
+from PyQt6.QtGui import QFont, QPalette, QColor, QIcon, QTextCursor
 
-class CommandThread(QThread):
+_ADB_DEV_RE = re.compile(r'^(\S+)\tdevice\b', re.MULTILINE)
+_ADB_FRAME_LEN_RE = re.compile(rb'[0-9a-fA-F]{4}')
+
+_DARK_QSS = """
+    QMainWindow {
+        background-color: #1e1e1e;
+        color: #ffffff;
+    }
+    
+    QGroupBox {
+        font-weight: bold;
+        border: 2px solid #3a3a3a;
+        border-radius: 8px;
+        margin-top: 1ex;
+        padding: 10px;
+        background-color: #2d2d2d;
+    }
+    
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 10px;
+        padding: 0 10px 0 10px;
+        color: #00d4aa;
+    }
+    
+    #configSection {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #2d2d2d, stop: 1 #252525);
+    }
+    
+    #terminalSection {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #1a1a1a, stop: 1 #0f0f0f);
+    }
+    
+    #controlSection {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #2d2d2d, stop: 1 #252525);
+    }
+    
+    #terminal {
+        background-color: #0a0a0a;
+        color: #00ff41;
+        border: 2px solid #333333;
+        border-radius: 6px;
+        padding: 8px;
+        font-family: 'Consolas', monospace;
+    }
+    
+    QLabel {
+        color: #ffffff;
+        font-weight: bold;
+    }
+    
+    QComboBox {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 2px solid #555555;
+        border-radius: 6px;
+        padding: 6px;
+        min-width: 80px;
+    }
+    
+    QComboBox:hover {
+        border-color: #00d4aa;
+        background-color: #404040;
+    }
+    
+    QComboBox::drop-down {
+        subcontrol-origin: padding;
+        subcontrol-position: top right;
+        width: 25px;
+        border-left: 2px solid #555555;
+        background-color: #4a4a4a;
+    }
+    
+    QComboBox::down-arrow {
+        width: 12px;
+        height: 12px;
+        background-color: #00d4aa;
+    }
+    
+    QLineEdit {
+        background-color: #3a3a3a;
+        color: #ffffff;
+        border: 2px solid #555555;
+        border-radius: 6px;
+        padding: 8px;
+        font-size: 11px;
+    }
+    
+    QLineEdit:focus {
+        border-color: #00d4aa;
+        background-color: #404040;
+    }
+    
+    #commandInput {
+        background-color: #2a2a2a;
+        color: #00ff41;
+        font-family: 'Consolas', monospace;
+    }
+    
+    QPushButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #4a4a4a, stop: 1 #3a3a3a);
+        color: #ffffff;
+        border: 2px solid #555555;
+        border-radius: 8px;
+        padding: 10px 20px;
+        font-weight: bold;
+        font-size: 11px;
+    }
+    
+    QPushButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #5a5a5a, stop: 1 #4a4a4a);
+        border-color: #00d4aa;
+    }
+    
+    QPushButton:pressed {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #3a3a3a, stop: 1 #2a2a2a);
+    }
+    
+    #startButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #00aa44, stop: 1 #008833);
+    }
+    
+    #startButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #00cc55, stop: 1 #00aa44);
+    }
+    
+    #stopButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #cc4444, stop: 1 #aa3333);
+    }
+    
+    #stopButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #dd5555, stop: 1 #cc4444);
+    }
+    
+    #testButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #4488cc, stop: 1 #3377bb);
+    }
+    
+    #testButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #5599dd, stop: 1 #4488cc);
+    }
+    
+    #audioButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #cc8844, stop: 1 #bb7733);
+    }
+    
+    #audioButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #dd9955, stop: 1 #cc8844);
+    }
+    
+    #submitButton {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #6644cc, stop: 1 #5533bb);
+    }
+    
+    #submitButton:hover {
+        background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                                  stop: 0 #7755dd, stop: 1 #6644cc);
+    }
+    
+    QCheckBox {
+        color: #ffffff;
+        font-weight: bold;
+    }
+    
+    QCheckBox::indicator {
+        width: 18px;
+        height: 18px;
+        border: 2px solid #555555;
+        border-radius: 4px;
+        background-color: #3a3a3a;
+    }
+    
+    QCheckBox::indicator:checked {
+        background-color: #00d4aa;
+        border-color: #00d4aa;
+    }
+    
+    QCheckBox::indicator:hover {
+        border-color: #00d4aa;
+    }
+"""
+
+def _wait_event_driven(pids, timeout):
+    """Block until every pid exits or the shared timeout expires, without polling.
+    
+    Returns the set of pids still running, or None when the platform has
+    neither pidfd nor kqueue process events.
+    """
+    deadline = time.monotonic() + timeout
+    alive = set()
+    try:
+        if hasattr(os, "pidfd_open"):
+            p = select.poll()
+            fds = {}
+            try:
+                for pid in pids:
+                    try:
+                        fd = os.pidfd_open(pid)
+                    except ProcessLookupError:
+                        # Already exited and reaped
+                        continue
+                    fds[fd] = pid
+                    p.register(fd, select.POLLIN)
+                alive = set(fds.values())
+                while alive:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    for fd, _ in p.poll(remaining * 1000):
+                        p.unregister(fd)
+                        alive.discard(fds[fd])
+                return alive
+            finally:
+                for fd in fds:
+                    os.close(fd)
+        if hasattr(select, "kqueue"):
+            kq = select.kqueue()
+            try:
+                for pid in pids:
+                    kev = select.kevent(pid, filter=select.KQ_FILTER_PROC,
+                                        flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                                        fflags=select.KQ_NOTE_EXIT)
+                    try:
+                        kq.control([kev], 0, 0)
+                    except ProcessLookupError:
+                        continue
+                    alive.add(pid)
+                while alive:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    for ev in kq.control(None, len(alive), remaining):
+                        alive.discard(ev.ident)
+                return alive
+            finally:
+                kq.close()
+    except OSError:
+        # e.g. pidfd_open on a kernel older than 5.3
+        pass
+    return None
+
+# Characters that need a shell to interpret (pipes, redirects, globs, ...)
+_SHELL_METACHARS = frozenset('|&;<>()$`^%!*?')
+
+class CommandProcess(QProcess):
+    # sip still provides a lazy __dict__, but these attributes never need it
+    __slots__ = ("capture", "captured", "child_pid", "buffers")
     output_signal = pyqtSignal(str)
-    finished_signal = pyqtSignal(int)
+    finished_signal = pyqtSignal(int, object)
     
-    def __init__(self, command, cmd_prefix=""):
-        super().__init__()
-        self.command = command
-        self.cmd_prefix = cmd_prefix
-        self.process = None
-        
-    def run(self):
-        try:
-            # Prepend command prefix if the command starts with adb or scrcpy
-            if re.match(r'^(adb|scrcpy)', self.command):
-                full_command = f"{self.cmd_prefix}{self.command}"
-                # If in scrcpy folder, navigate to it
-                if os.path.isdir("scrcpy"):
-                    full_command = f"cd scrcpy && {full_command}"
+    def __init__(self, command, cwd=None, capture=False, parent=None, native_args=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.captured = []
+        self.child_pid = 0
+        # Partial lines per stream, keyed by is_stderr
+        self.buffers = {False: bytearray(), True: bytearray()}
+        
+        # An argv list runs directly, a plain string goes through the shell
+        if isinstance(command, str):
+            if platform.system() == 'Windows':
+                # /s strips only the outer quotes, keeping a quoted program path intact
+                self.setProgram("cmd.exe")
+                self.setArguments(["/s", "/c"])
+                self.setNativeArguments(f'"{command}"')
             else:
-                full_command = self.command
-                
-            self.process = subprocess.Popen(
-                full_command, shell=True, stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, text=True, bufsize=1, 
-                universal_newlines=True
-            )
-            
-            while True:
-                line = self.process.stdout.readline()
-                if not line and self.process.poll() is not None:
-                    break
-                if line:
-                    self.output_signal.emit(line)
-            
-            # Check for errors
-            stderr = self.process.stderr.read()
-            if stderr:
-                self.output_signal.emit(f"ERROR: {stderr}\n")
-                
-            return_code = self.process.wait()
-            self.output_signal.emit(f"Command completed with return code: {return_code}\n")
-            self.finished_signal.emit(return_code)
-            
-        except Exception as e:
-            self.output_signal.emit(f"Exception: {str(e)}\n")
-            self.finished_signal.emit(-1)
+                self.setProgram("/bin/sh")
+                self.setArguments(["-c", command])
+        else:
+            self.setProgram(command[0])
+            self.setArguments(command[1:])
+            if native_args:
+                # Windows only: appended to the command line verbatim
+                self.setNativeArguments(native_args)
+        if cwd:
+            self.setWorkingDirectory(cwd)
+        
+        self.readyReadStandardOutput.connect(self.read_stdout)
+        self.readyReadStandardError.connect(self.read_stderr)
+        self.finished.connect(self.emit_finished)
+        self.errorOccurred.connect(self.on_error)
     
-    def terminate_process(self):
-        if self.process:
-            try:
-                if platform.system() == 'Windows':
-                    subprocess.run(f"taskkill /F /T /PID {self.process.pid}", shell=True)
-                else:
-                    self.process.terminate()
-                    self.process.wait(timeout=5)
-            except:
-                pass
+    def read_stdout(self):
+        self.feed(bytes(self.readAllStandardOutput()), False)
+    
+    def read_stderr(self):
+        self.feed(bytes(self.readAllStandardError()), True)
+    
+    def feed(self, data, is_stderr):
+        """Buffer raw output and emit every complete line in one chunk"""
+        buf = self.buffers[is_stderr]
+        buf += data
+        end = buf.rfind(b"\n") + 1
+        if end:
+            self.emit_output(bytes(buf[:end]), is_stderr)
+            del buf[:end]
+    
+    def emit_output(self, data, is_stderr):
+        text = data.decode(errors="replace").replace("\r\n", "\n")
+        if is_stderr:
+            self.output_signal.emit(f"ERROR: {text}")
+            return
+        if self.capture:
+            self.captured.append(text)
+        self.output_signal.emit(text)
+    
+    def emit_finished(self, exit_code, exit_status):
+        # Drain the pipes and flush whatever is left after the last newline
+        self.read_stdout()
+        self.read_stderr()
+        for is_stderr, buf in self.buffers.items():
+            if buf:
+                self.emit_output(bytes(buf), is_stderr)
+                buf.clear()
+        return_code = exit_code if exit_status == QProcess.ExitStatus.NormalExit else -1
+        self.output_signal.emit(f"Command completed with return code: {return_code}\n")
+        self.finished_signal.emit(return_code, "".join(self.captured))
+    
+    def on_error(self, error):
+        # A process that never started won't emit finished
+        if error == QProcess.ProcessError.FailedToStart:
+            self.output_signal.emit(f"Exception: {self.errorString()}\n")
+            self.finished_signal.emit(-1, "".join(self.captured))
 
 class ScrcpyController(QMainWindow):
     def __init__(self):
@@ -75,43 +360,65 @@ class ScrcpyController(QMainWindow):
         self.setWindowIcon(QIcon("scrcpy/icon.ico"))  # <- Tambahkan icon di sini
         self.setGeometry(100, 100, 1000, 700)
         
-        # Detect OS and command prefix
+        # Detect OS
         self.os_name = platform.system()
-        self.cmd_prefix = '.\\' if self.os_name == 'Windows' else './'
+        self._tool_paths = {}
         self.running_processes = []
-        self.device_list = []
+        self.running_pids = []
+        self.sndcpy_processes = []
+        self._current_devices = set()
+        self._pending_lines = []
+        
+        # Resolve the scrcpy folder once instead of on every command
+        self.scrcpy_cwd = "scrcpy" if os.path.isdir("scrcpy") else None
+        self.abs_scrcpy = os.path.abspath("scrcpy") if self.scrcpy_cwd else None
         
-        # Check command prefix
-        self.check_command_prefix()
+        # Terminal emulator used to run sndcpy outside Windows
+        self.terminal_cmd = None
+        if self.os_name != 'Windows':
+            self.terminal_cmd = next((t for t in ("xterm", "gnome-terminal", "konsole", "alacritty")
+                                      if shutil.which(t)), None)
         
         # Set up the UI
         self.init_ui()
-        self.apply_dark_theme()
         
-        
-    def check_command_prefix(self):
-        """Test whether we need to use .\ prefix for commands"""
-        try:
-            # Try without prefix first
-            result = subprocess.run("adb --version", shell=True, 
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if result.returncode == 0:
-                self.cmd_prefix = ''
-                return
-            
-            # Try with prefix
-            result = subprocess.run(".\\adb --version", shell=True, 
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if result.returncode == 0:
-                self.cmd_prefix = '.\\'
-                return
-                
-            # Default fallback
-            self.cmd_prefix = '.\\' if self.os_name == 'Windows' else './'
-            
-        except Exception:
-            # Default fallback
-            self.cmd_prefix = '.\\' if self.os_name == 'Windows' else './'
+        # Flush buffered terminal output at most every 50 ms
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(50)
+        self._flush_timer.timeout.connect(self._flush_terminal)
+        self._flush_timer.start()
+        
+        # Follow device changes from a single long-lived adb process
+        self._track_buffer = bytearray()
+        self._tracker_delay = 1000
+        self._closing = False
+        self.device_tracker = QProcess(self)
+        self.device_tracker.setProgram(self.resolve_tool("adb"))
+        self.device_tracker.setArguments(["track-devices"])
+        self.device_tracker.setStandardErrorFile(QProcess.nullDevice())
+        if self.scrcpy_cwd:
+            self.device_tracker.setWorkingDirectory(self.scrcpy_cwd)
+        self.device_tracker.readyReadStandardOutput.connect(self.read_device_tracker)
+        self.device_tracker.errorOccurred.connect(self.on_tracker_error)
+        self.device_tracker.finished.connect(self.on_tracker_finished)
+        self.device_tracker.start()
+        
+    def resolve_tool(self, name):
+        """Return the path used to launch adb or scrcpy"""
+        if name not in self._tool_paths:
+            self._tool_paths[name] = self.find_tool(name)
+        return self._tool_paths[name]
+    
+    def find_tool(self, name):
+        """Prefer the bundled binary, then fall back to PATH"""
+        # Neither Windows nor QProcess searches the child's cwd, so use an absolute path
+        if self.abs_scrcpy:
+            candidates = (name + ".exe", name) if self.os_name == 'Windows' else (name,)
+            for candidate in candidates:
+                path = os.path.join(self.abs_scrcpy, candidate)
+                if os.path.isfile(path):
+                    return path
+        return shutil.which(name) or name
 
     def init_ui(self):
         # Central widget
@@ -219,6 +526,7 @@ class ScrcpyController(QMainWindow):
         self.terminal_output.setObjectName("terminal")
         self.terminal_output.setReadOnly(True)
         self.terminal_output.setFont(QFont("Consolas", 10))
+        self.terminal_output.document().setMaximumBlockCount(5000)
         self.terminal_output.append("🚀 Scrcpy Controller Ready!")
         self.terminal_output.append("📱 Connect your Android device and click 'Test Devices' to begin.")
         
@@ -244,206 +552,46 @@ class ScrcpyController(QMainWindow):
         
         return group_box
     
-    def apply_dark_theme(self):
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            
-            QGroupBox {
-                font-weight: bold;
-                border: 2px solid #3a3a3a;
-                border-radius: 8px;
-                margin-top: 1ex;
-                padding: 10px;
-                background-color: #2d2d2d;
-            }
-            
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 10px 0 10px;
-                color: #00d4aa;
-            }
-            
-            #configSection {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #2d2d2d, stop: 1 #252525);
-            }
-            
-            #terminalSection {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #1a1a1a, stop: 1 #0f0f0f);
-            }
-            
-            #controlSection {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #2d2d2d, stop: 1 #252525);
-            }
-            
-            #terminal {
-                background-color: #0a0a0a;
-                color: #00ff41;
-                border: 2px solid #333333;
-                border-radius: 6px;
-                padding: 8px;
-                font-family: 'Consolas', monospace;
-            }
-            
-            QLabel {
-                color: #ffffff;
-                font-weight: bold;
-            }
-            
-            QComboBox {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 2px solid #555555;
-                border-radius: 6px;
-                padding: 6px;
-                min-width: 80px;
-            }
-            
-            QComboBox:hover {
-                border-color: #00d4aa;
-                background-color: #404040;
-            }
-            
-            QComboBox::drop-down {
-                subcontrol-origin: padding;
-                subcontrol-position: top right;
-                width: 25px;
-                border-left: 2px solid #555555;
-                background-color: #4a4a4a;
-            }
-            
-            QComboBox::down-arrow {
-                width: 12px;
-                height: 12px;
-                background-color: #00d4aa;
-            }
-            
-            QLineEdit {
-                background-color: #3a3a3a;
-                color: #ffffff;
-                border: 2px solid #555555;
-                border-radius: 6px;
-                padding: 8px;
-                font-size: 11px;
-            }
-            
-            QLineEdit:focus {
-                border-color: #00d4aa;
-                background-color: #404040;
-            }
-            
-            #commandInput {
-                background-color: #2a2a2a;
-                color: #00ff41;
-                font-family: 'Consolas', monospace;
-            }
-            
-            QPushButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #4a4a4a, stop: 1 #3a3a3a);
-                color: #ffffff;
-                border: 2px solid #555555;
-                border-radius: 8px;
-                padding: 10px 20px;
-                font-weight: bold;
-                font-size: 11px;
-            }
-            
-            QPushButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #5a5a5a, stop: 1 #4a4a4a);
-                border-color: #00d4aa;
-            }
-            
-            QPushButton:pressed {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #3a3a3a, stop: 1 #2a2a2a);
-            }
-            
-            #startButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #00aa44, stop: 1 #008833);
-            }
-            
-            #startButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #00cc55, stop: 1 #00aa44);
-            }
-            
-            #stopButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #cc4444, stop: 1 #aa3333);
-            }
-            
-            #stopButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #dd5555, stop: 1 #cc4444);
-            }
-            
-            #testButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #4488cc, stop: 1 #3377bb);
-            }
-            
-            #testButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #5599dd, stop: 1 #4488cc);
-            }
-            
-            #audioButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #cc8844, stop: 1 #bb7733);
-            }
-            
-            #audioButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #dd9955, stop: 1 #cc8844);
-            }
-            
-            #submitButton {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #6644cc, stop: 1 #5533bb);
-            }
-            
-            #submitButton:hover {
-                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
-                                          stop: 0 #7755dd, stop: 1 #6644cc);
-            }
-            
-            QCheckBox {
-                color: #ffffff;
-                font-weight: bold;
-            }
-            
-            QCheckBox::indicator {
-                width: 18px;
-                height: 18px;
-                border: 2px solid #555555;
-                border-radius: 4px;
-                background-color: #3a3a3a;
-            }
-            
-            QCheckBox::indicator:checked {
-                background-color: #00d4aa;
-                border-color: #00d4aa;
-            }
-            
-            QCheckBox::indicator:hover {
-                border-color: #00d4aa;
-            }
-        """)
-    
     def write_to_terminal(self, text):
-        """Write text to terminal output"""
-        self.terminal_output.append(text.rstrip())
+        """Queue text for the next terminal flush"""
+        self._pending_lines.append(text.rstrip())
+    
+    def _flush_terminal(self):
+        """Write all queued lines to the terminal in one insert"""
+        if not self._pending_lines:
+            return
+        self.terminal_output.moveCursor(QTextCursor.MoveOperation.End)
+        self.terminal_output.insertPlainText("\n" + "\n".join(self._pending_lines))
+        self._pending_lines.clear()
         self.terminal_output.ensureCursorVisible()
     
+    def start_process(self, command, on_finished, cwd=None, capture=False, native_args=None):
+        """Start command as a QProcess and stream its output to the terminal"""
+        proc = CommandProcess(command, cwd, capture, self, native_args)
+        proc.output_signal.connect(self.write_to_terminal)
+        # Reap first so on_finished already sees the updated list
+        proc.finished_signal.connect(self._reap)
+        proc.finished_signal.connect(on_finished)
+        self.running_processes.append(proc)
+        proc.start()
+        
+        # Remember the child pid so Stop All can signal exactly this process
+        proc.child_pid = proc.processId()
+        if proc.child_pid:
+            self.running_pids.append(proc.child_pid)
+        return proc
+    
+    def _reap(self, _code, _output):
+        """Forget a finished process and free it"""
+        proc = self.sender()
+        try:
+            self.running_processes.remove(proc)
+        except ValueError:
+            pass
+        if proc.child_pid in self.running_pids:
+            self.running_pids.remove(proc.child_pid)
+        proc.deleteLater()
+    
     def submit_command(self):
         """Execute command from input field"""
         command = self.command_input.text().strip()
@@ -453,135 +601,207 @@ class ScrcpyController(QMainWindow):
         self.write_to_terminal(f"💻 > {command}")
         self.command_input.clear()
         
-        # Execute command in thread
-        thread = CommandThread(command, self.cmd_prefix)
-        thread.output_signal.connect(self.write_to_terminal)
-        thread.finished_signal.connect(lambda code: self.write_to_terminal(f"✅ Command finished with code: {code}"))
-        thread.start()
-        self.running_processes.append(thread)
+        # Run adb and scrcpy directly, anything else through the shell
+        if not (command.startswith(("adb ", "scrcpy ", "adb\t", "scrcpy\t")) or command in ("adb", "scrcpy")):
+            self.start_process(command, self._on_generic_finished)
+            return
+        
+        name = command.split(None, 1)[0]
+        rest = command[len(name):]
+        tool = self.resolve_tool(name)
+        if _SHELL_METACHARS.intersection(command):
+            # Pipes and redirects still need the shell, just swap in the resolved binary
+            quoted = f'"{tool}"' if self.os_name == 'Windows' else shlex.quote(tool)
+            self.start_process(quoted + rest, self._on_generic_finished, cwd=self.scrcpy_cwd)
+        elif self.os_name == 'Windows':
+            # Let the program parse its own command line, as cmd would have
+            self.start_process([tool], self._on_generic_finished, cwd=self.scrcpy_cwd,
+                               native_args=rest.strip())
+        else:
+            try:
+                argv = shlex.split(command)
+            except ValueError as e:
+                self.write_to_terminal(f"❌ Invalid command: {str(e)}")
+                return
+            argv[0] = tool
+            self.start_process(argv, self._on_generic_finished, cwd=self.scrcpy_cwd)
+    
+    def _on_generic_finished(self, code, _output):
+        """Report the exit code of a manual command"""
+        self.write_to_terminal(f"✅ Command finished with code: {code}")
     
     def test_devices(self):
         """Test connected Android devices"""
         self.write_to_terminal("🔍 Testing connected devices...")
         
         # Create adb devices command
-        if os.path.isdir("scrcpy"):
-            adb_cmd = f"cd scrcpy && {self.cmd_prefix}adb devices"
-        else:
-            adb_cmd = f"{self.cmd_prefix}adb devices"
+        adb_cmd = [self.resolve_tool("adb"), "devices"]
         
-        thread = CommandThread(adb_cmd, self.cmd_prefix)
-        thread.output_signal.connect(self.write_to_terminal)
-        thread.finished_signal.connect(self.parse_devices)
-        thread.start()
-        self.running_processes.append(thread)
+        self.start_process(adb_cmd, self.parse_devices, cwd=self.scrcpy_cwd, capture=True)
+    
+    def read_device_tracker(self):
+        """Parse the length-prefixed frames printed by adb track-devices"""
+        self._track_buffer += bytes(self.device_tracker.readAllStandardOutput())
+        while len(self._track_buffer) >= 4:
+            if not _ADB_FRAME_LEN_RE.fullmatch(self._track_buffer[:4]):
+                # Not framed output, drop just this line and resync after it
+                end = self._track_buffer.find(b"\n")
+                if end < 0:
+                    return
+                del self._track_buffer[:end + 1]
+                continue
+            size = int(self._track_buffer[:4], 16)
+            if len(self._track_buffer) < 4 + size:
+                return
+            payload = bytes(self._track_buffer[4:4 + size]).decode(errors="replace")
+            del self._track_buffer[:4 + size]
+            
+            self._tracker_delay = 1000
+            devices = _ADB_DEV_RE.findall(payload)
+            if self.update_device_combo(devices):
+                self.write_to_terminal(f"📱 Devices changed: {', '.join(devices) or 'none'}")
+    
+    def on_tracker_error(self, error):
+        """Report an adb track-devices process that could not start"""
+        if error == QProcess.ProcessError.FailedToStart:
+            self.write_to_terminal(f"⚠️ Device tracking unavailable: {self.device_tracker.errorString()}. "
+                                   "Use 'Test Devices' instead.")
+    
+    def on_tracker_finished(self, exit_code, _exit_status):
+        """Restart adb track-devices, e.g. after adb kill-server"""
+        if self._closing:
+            return
+        self.write_to_terminal(f"⚠️ Device tracking stopped (code {exit_code}), "
+                               f"restarting in {self._tracker_delay // 1000}s...")
+        self._track_buffer.clear()
+        QTimer.singleShot(self._tracker_delay, self.device_tracker.start)
+        # Back off if adb keeps exiting straight away
+        self._tracker_delay = min(self._tracker_delay * 2, 60000)
+    
+    def update_device_combo(self, devices):
+        """Refill the device dropdown, returns False if the set is unchanged"""
+        new = set(devices)
+        if new == self._current_devices:
+            return False
+        self._current_devices = new
+        
+        prev = self.device_combo.currentText()
+        self.device_combo.clear()
+        if devices:
+            self.device_combo.addItems(devices)
+            # Keep the selected device if it is still connected
+            if prev in new:
+                self.device_combo.setCurrentText(prev)
+        else:
+            self.device_combo.addItem("No devices detected")
+        return True
     
-    def parse_devices(self, return_code):
+    def parse_devices(self, return_code, adb_stdout):
         """Parse device list from adb devices output"""
         if return_code == 0:
-            # Parse terminal output to extract device list
-            terminal_text = self.terminal_output.toPlainText()
-            lines = terminal_text.split('\n')
-            
-            devices = []
-            for line in lines:
-                if '\tdevice' in line:
-                    device_id = line.split('\t')[0].strip()
-                    if device_id and device_id != "List of devices attached":
-                        devices.append(device_id)
+            devices = _ADB_DEV_RE.findall(adb_stdout)
             
-            self.device_combo.clear()
+            self.update_device_combo(devices)
             if devices:
-                self.device_combo.addItems(devices)
                 self.write_to_terminal(f"📱 Found {len(devices)} device(s)")
             else:
-                self.device_combo.addItem("No devices detected")
                 self.write_to_terminal("❌ No devices found. Check USB debugging is enabled.")
     
     def build_scrcpy_command(self):
-        """Build scrcpy command from UI selections"""
-        command_parts = ["scrcpy"]
+        """Build scrcpy argv from UI selections"""
+        argv = ["scrcpy"]
         
         # Video bit rate
         if self.bitrate_combo.currentText() != "NONE":
-            command_parts.append(f"--video-bit-rate {self.bitrate_combo.currentText()}")
+            argv += ["--video-bit-rate", self.bitrate_combo.currentText()]
         
         # Max FPS
         if self.fps_combo.currentText() != "NONE":
-            command_parts.append(f"--max-fps {self.fps_combo.currentText()}")
+            argv += ["--max-fps", self.fps_combo.currentText()]
         
-        # Window title
+        # Window title, passed as a single argument so it needs no quoting
         window_title = self.window_title_input.text().strip()
         if window_title:
-            command_parts.append(f'--window-title "{window_title}"')
+            argv += ["--window-title", window_title]
         
         # Max size
         if self.maxsize_combo.currentText() != "NONE":
-            command_parts.append(f"--max-size {self.maxsize_combo.currentText()}")
+            argv += ["--max-size", self.maxsize_combo.currentText()]
         
         # Render driver
-        command_parts.append("--render-driver=opengl")
+        argv += ["--render-driver", "opengl"]
         
         # Show FPS
         if self.show_fps_checkbox.isChecked():
-            command_parts.append("--print-fps")
+            argv.append("--print-fps")
         
         # Device selection - either USB or specific serial
         if (self.device_combo.currentText() != "No devices detected" and 
             self.device_combo.currentText()):
-            command_parts.append(f"--serial={self.device_combo.currentText()}")
+            argv += ["--serial", self.device_combo.currentText()]
         else:
-            command_parts.append("--select-usb")
+            argv.append("--select-usb")
         
-        return " ".join(command_parts)
+        return argv
     
     def start_scrcpy(self):
         """Start scrcpy with configured options"""
-        command = self.build_scrcpy_command()
-        self.write_to_terminal(f"🚀 Starting: {command}")
+        argv = self.build_scrcpy_command()
+        self.write_to_terminal(f"🚀 Starting: {shlex.join(argv)}")
         
         # Update UI
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         
-        # Run in scrcpy folder if it exists
-        if os.path.isdir("scrcpy"):
-            full_command = f"cd scrcpy && {self.cmd_prefix}{command}"
-        else:
-            full_command = f"{self.cmd_prefix}{command}"
+        # Resolve the binary, run in scrcpy folder if it exists
+        argv[0] = self.resolve_tool(argv[0])
         
-        thread = CommandThread(full_command, self.cmd_prefix)
-        thread.output_signal.connect(self.write_to_terminal)
-        thread.finished_signal.connect(self.on_scrcpy_finished)
-        thread.start()
-        self.running_processes.append(thread)
+        self.start_process(argv, self.on_scrcpy_finished, cwd=self.scrcpy_cwd)
     
-    def on_scrcpy_finished(self, return_code):
+    def on_scrcpy_finished(self, return_code, _output):
         """Handle scrcpy process completion"""
         self.start_btn.setEnabled(True)
-        if not self.running_processes:
+        # running_pids also covers sndcpy terminals, which Stop All must still reach
+        self.prune_sndcpy()
+        if not self.running_pids:
             self.stop_btn.setEnabled(False)
         self.write_to_terminal(f"📱 Scrcpy finished with code: {return_code}")
     
+    def prune_sndcpy(self):
+        """Reap sndcpy terminals that exited on their own and forget their pids"""
+        alive = []
+        for proc in self.sndcpy_processes:
+            if proc.poll() is None:
+                alive.append(proc)
+            elif proc.pid in self.running_pids:
+                self.running_pids.remove(proc.pid)
+        self.sndcpy_processes = alive
+    
     def run_sndcpy(self):
         """Run sndcpy in a separate terminal window"""
         self.write_to_terminal("🔊 Running sndcpy in separate terminal...")
+        self.prune_sndcpy()
         
         try:
             if self.os_name == 'Windows':
-                if os.path.isdir("scrcpy"):
-                    cmd = f'start cmd.exe /k "cd /d {os.path.abspath("scrcpy")} && {self.cmd_prefix}sndcpy.bat"'
+                proc = subprocess.Popen(["cmd.exe", "/k", "sndcpy.bat"], cwd=self.abs_scrcpy,
+                                        creationflags=subprocess.CREATE_NEW_CONSOLE)
+            elif self.terminal_cmd:
+                # gnome-terminal deprecated -e in favour of --, and its client normally
+                # exits at once; --wait keeps the tracked pid alive as long as the script
+                if self.terminal_cmd == "gnome-terminal":
+                    exec_args = ["--wait", "--"]
                 else:
-                    cmd = f'start cmd.exe /k "{self.cmd_prefix}sndcpy.bat"'
+                    exec_args = ["-e"]
+                # sndcpy.bat is Windows only, use the bundled shell script
+                proc = subprocess.Popen([self.terminal_cmd, *exec_args, "bash", "sndcpy"], cwd=self.abs_scrcpy)
             else:
-                terminal_cmd = "xterm" if os.system("which xterm > /dev/null") == 0 else "gnome-terminal"
-                
-                if os.path.isdir("scrcpy"):
-                    cmd = f'{terminal_cmd} -e "cd {os.path.abspath("scrcpy")} && {self.cmd_prefix}sndcpy.bat"'
-                else:
-                    cmd = f'{terminal_cmd} -e "{self.cmd_prefix}sndcpy.bat"'
-            
-            subprocess.Popen(cmd, shell=True)
+                self.write_to_terminal("❌ No terminal emulator found (tried xterm, gnome-terminal, konsole, alacritty)")
+                return
+            # Keep the Popen so the pid isn't reaped and reused behind our back
+            self.sndcpy_processes.append(proc)
+            self.running_pids.append(proc.pid)
+            self.stop_btn.setEnabled(True)
             self.write_to_terminal("✅ sndcpy launched in separate terminal")
             
         except Exception as e:
@@ -591,31 +811,45 @@ class ScrcpyController(QMainWindow):
         """Stop all running processes including sndcpy"""
         self.write_to_terminal("⏹️ Stopping all processes...")
         
-        # Stop scrcpy and other processes
-        for thread in self.running_processes:
-            if thread.isRunning():
-                thread.terminate_process()
-                thread.terminate()
+        # Signal only the processes we started, including sndcpy terminals
+        self.prune_sndcpy()
+        pids = list(self.running_pids)
+        for pid in pids:
+            try:
+                if self.os_name == 'Windows':
+                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+                else:
+                    os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        
+        # Wait for all of them under one deadline, escalating if SIGTERM is ignored
+        if self.os_name != 'Windows':
+            for pid in _wait_event_driven(pids, 5) or ():
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
         
-        # Stop sndcpy processes
-        try:
-            if self.os_name == 'Windows':
-                subprocess.run("taskkill /F /IM sndcpy.exe", shell=True, capture_output=True)
-                subprocess.run("taskkill /F /IM scrcpy.exe", shell=True, capture_output=True)
-            else:
-                subprocess.run("pkill -f sndcpy", shell=True, capture_output=True)
-                subprocess.run("pkill -f scrcpy", shell=True, capture_output=True)
-        except:
-            pass
+        # Reap sndcpy terminals that have exited
+        self.prune_sndcpy()
         
+        self.running_pids.clear()
         self.running_processes.clear()
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.write_to_terminal("✅ All processes stopped")
+    
+    def closeEvent(self, event):
+        self._closing = True
+        self.device_tracker.kill()
+        self.device_tracker.waitForFinished(1000)
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
     app.setApplicationName("Scrcpy Controller")
+    app.setStyleSheet(_DARK_QSS)
     
     window = ScrcpyController()
     window.show()